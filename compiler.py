@@ -0,0 +1,980 @@
+from operator import add, sub, mul, truediv, and_, or_, not_, lt, le, gt, ge, eq, ne
+from typing import Optional
+
+from stimpl.expression import *
+from stimpl.types import *
+from stimpl.errors import *
+
+"""
+Opcodes
+"""
+
+OP_PUSH = 0
+OP_LOAD = 1
+OP_STORE = 2
+OP_PRINT = 3
+OP_POP = 4
+OP_ADD = 5
+OP_SUBTRACT = 6
+OP_MULTIPLY = 7
+OP_DIVIDE = 8
+OP_AND = 9
+OP_OR = 10
+OP_NOT = 11
+OP_LT = 12
+OP_LTE = 13
+OP_GT = 14
+OP_GTE = 15
+OP_EQ = 16
+OP_NE = 17
+OP_JUMP = 18
+OP_BRANCH_IF = 19
+OP_BRANCH_WHILE = 20
+OP_MEMO_BEGIN = 21
+OP_MEMO_END = 22
+OP_ADD_TYPED = 23
+OP_SUBTRACT_TYPED = 24
+OP_MULTIPLY_TYPED = 25
+OP_DIVIDE_INTEGER = 26
+OP_DIVIDE_FLOATING_POINT = 27
+OP_AND_BOOLEAN = 28
+OP_OR_BOOLEAN = 29
+OP_NOT_BOOLEAN = 30
+OP_LT_TYPED = 31
+OP_LTE_TYPED = 32
+OP_GT_TYPED = 33
+OP_GTE_TYPED = 34
+OP_EQ_TYPED = 35
+OP_NE_TYPED = 36
+OP_AND_SKIP = 37
+OP_OR_SKIP = 38
+OP_LOOP_WHILE = 39
+OP_COMPARE_BRANCH = 40
+OP_COMPARE_LOOP = 41
+OP_LOAD_BOUND = 42
+OP_APPLY_SLOT_CONSTANT = 43
+OP_APPLY_SLOT_SLOT = 44
+OP_STORE_TYPED = 45
+OP_MEMO_CLEAR = 46
+
+
+"""
+Analysis results
+"""
+
+
+class Analysis(object):
+    """
+    What the analysis passes found out about one program. Per-node results
+    are kept in tables keyed by `id(node)` rather than on the nodes, so the
+    caller's tree is never modified. The tables are only meaningful while
+    that tree is alive.
+    """
+
+    __slots__ = ('nodes', 'hot', 'slots', 'variable_types', 'pure', 'memoize', 'loop_memos',
+                 'static_type', 'constant', 'bound', 'total')
+
+    def __init__(self, expression: Expr) -> None:
+        # Every node of the program in postorder, walked by each pass, and
+        # whether it has a loop likely to run many times. See `hot_loop`.
+        self.nodes = postorder(expression)
+        self.hot = False
+        # Variable name -> slot, and -> the type every assignment to it
+        # agrees on (or None).
+        self.slots = {}
+        self.variable_types = {}
+        # id(node) -> tag. See the pass that sets each one.
+        self.pure = {}
+        self.memoize = {}
+        self.loop_memos = {}
+        self.static_type = {}
+        self.constant = {}
+        self.bound = {}
+        self.total = {}
+
+    @property
+    def variable_names(self) -> list:
+        return list(self.slots)
+
+
+"""
+Purity analysis
+"""
+
+
+def no_children(expression: Expr) -> list:
+    return []
+
+
+def binary_children(expression: BinaryOperator) -> list:
+    return [expression.left, expression.right]
+
+
+def sequence_children(expression: Sequence) -> list:
+    return expression.exprs
+
+
+# Child accessors keyed by node class. Looking up the exact class replaces a
+# chain of structural `match` cases on every node of every pass. Subclasses
+# of these node classes are resolved through their MRO on first use and then
+# cached here as well.
+CHILDREN = {
+    Ren: no_children,
+    Literal: no_children,
+    IntLiteral: no_children,
+    FloatingPointLiteral: no_children,
+    StringLiteral: no_children,
+    BooleanLiteral: no_children,
+    Variable: no_children,
+    Print: lambda expression: [expression.to_print],
+    Not: lambda expression: [expression.expr],
+    Assign: lambda expression: [expression.value],
+    Sequence: sequence_children,
+    Program: sequence_children,
+    If: lambda expression: [expression.condition, expression.true, expression.false],
+    While: lambda expression: [expression.condition, expression.body],
+    BinaryOperator: binary_children,
+    **{operator: binary_children
+       for operator in (And, Or, Lt, Lte, Gt, Gte, Eq, Ne, Add, Subtract, Multiply, Divide)},
+}
+
+
+def child_accessor(node_class: type):
+    """
+    The CHILDREN entry for the nearest class in `node_class`'s MRO.
+    """
+    accessor = next((CHILDREN[base] for base in node_class.__mro__ if base in CHILDREN),
+                    no_children)
+    CHILDREN[node_class] = accessor
+    return accessor
+
+
+def children(expression: Expr) -> list:
+    """
+    The direct subexpressions of `expression`, in evaluation order. The
+    result may be the node's own list and must not be modified.
+    """
+    node_class = type(expression)
+    return (CHILDREN.get(node_class) or child_accessor(node_class))(expression)
+
+
+def postorder(expression: Expr) -> list:
+    """
+    Every node of `expression`, children before parents. Uses an explicit
+    stack so deeply nested programs do not exhaust the Python call stack.
+
+    Popping children pushed in order yields a mirrored preorder, whose
+    reverse is the postorder.
+    """
+    nodes = []
+    work = [expression]
+    while work:
+        node = work.pop()
+        nodes.append(node)
+        node_class = type(node)
+        work.extend((CHILDREN.get(node_class) or child_accessor(node_class))(node))
+    nodes.reverse()
+    return nodes
+
+
+def mark_purity(expression: Expr, analysis: Analysis) -> bool:
+    """
+    Tag every node with `pure`: True when neither it nor any of its
+    descendants is an Assign or a Print. A pure expression's value depends
+    only on the state it is evaluated in.
+    """
+    pure = analysis.pure
+    for node in analysis.nodes:
+        pure[id(node)] = not isinstance(node, (Assign, Print)) and \
+            all(pure[id(child)] for child in children(node))
+    return pure[id(expression)]
+
+
+"""
+Type inference
+"""
+
+
+class Never(object):
+    """
+    Static type of an expression that can never produce a value, e.g. a
+    read of a variable that is never assigned.
+    """
+
+    def __repr__(self):
+        return "Never"
+
+
+NEVER = Never()
+
+
+def join(left, right):
+    if left is NEVER:
+        return right
+    if right is NEVER:
+        return left
+    if left is None or right is None or left != right:
+        return None
+    return left
+
+
+def infer_types(expression: Expr, variable_types: dict, analysis: Analysis) -> None:
+    """
+    Tag every node with `static_type`: the type its value is guaranteed to
+    have whenever its evaluation completes, or None when that is only known
+    at runtime. `variable_types` holds the types of the variables already
+    bound before `expression` runs.
+
+    A variable's type is fixed by its first assignment, so a variable has a
+    static type when every assignment to it agrees. Assignments can depend
+    on other variables (or themselves), so iterate to a fixed point,
+    starting from the optimistic assumption that unbound variables are
+    never read successfully.
+
+    The type every assignment to a variable agrees on, or None, is kept in
+    `variable_types` by name.
+    """
+    nodes = analysis.nodes
+    types = analysis.static_type
+    environment = dict(variable_types)
+    while True:
+        assigned = dict(variable_types)
+        for node in nodes:
+            types[id(node)] = static_type(node, environment, types)
+            if isinstance(node, Assign):
+                variable_name = node.variable.variable_name
+                assigned[variable_name] = join(
+                    assigned.get(variable_name, NEVER), types[id(node)])
+        if assigned == environment:
+            break
+        environment = assigned
+
+    analysis.variable_types = environment
+
+
+def static_type(expression: Expr, environment: dict, types: dict):
+    match expression:
+        case Ren():
+            return UNIT
+        case IntLiteral():
+            return INTEGER
+        case FloatingPointLiteral():
+            return FLOATING_POINT
+        case StringLiteral():
+            return STRING
+        case BooleanLiteral():
+            return BOOLEAN
+        case Variable(variable_name=variable_name):
+            return environment.get(variable_name, NEVER)
+        case Assign(value=value):
+            return types[id(value)]
+        case Print(to_print=to_print):
+            return types[id(to_print)]
+        case Sequence(exprs=exprs) | Program(exprs=exprs):
+            return types[id(exprs[-1])]
+        case If(true=true, false=false):
+            return join(types[id(true)], types[id(false)])
+        case Not() | And() | Or() | Lt() | Lte() | Gt() | Gte() | Eq() | Ne() | While():
+            return BOOLEAN
+        case Add(left=left, right=right):
+            return operand_type(types[id(left)], types[id(right)], (INTEGER, FLOATING_POINT, STRING))
+        case Subtract(left=left, right=right) | Multiply(left=left, right=right) | Divide(left=left, right=right):
+            return operand_type(types[id(left)], types[id(right)], (INTEGER, FLOATING_POINT))
+        case _:
+            return None
+
+
+def operand_type(left_type, right_type, allowed: tuple):
+    """
+    The static type shared by both operands when it is one of `allowed`.
+    """
+    if left_type is NEVER or right_type is NEVER:
+        return NEVER
+    if left_type is None or right_type is None or left_type != right_type:
+        return None
+    return left_type if left_type in allowed else None
+
+
+def known(static_type) -> bool:
+    return static_type is not None and static_type is not NEVER
+
+
+"""
+Definite assignment
+"""
+
+
+# Work items for mark_bound, besides visiting a node.
+BIND = 1
+SAVE = 2
+SWAP = 3
+MEET = 4
+RESTORE = 5
+
+
+def mark_bound(expression: Expr, variable_names, analysis: Analysis) -> None:
+    """
+    Tag every Variable node with `bound`: True when the variable is
+    certainly bound whenever the read runs, so the read cannot fail.
+
+    Walks the program in evaluation order, tracking the names certainly
+    bound so far: those bound before `expression` runs plus every name
+    assigned or successfully read since. After an If only names bound on
+    both branches count; after a While only names bound by its first
+    condition test, since the body may never run. A node reached from
+    several places is bound only if it is bound at all of them.
+
+    Later tests of a While condition start with at least the names bound
+    at the first, so they cannot unbind a read and the condition is only
+    walked once. Walking it again would double the work at each level of
+    loops nested in conditions.
+    """
+    tags = analysis.bound
+    for node in analysis.nodes:
+        if isinstance(node, Variable):
+            tags[id(node)] = True
+
+    bound = set(variable_names)
+    saved = []
+    work = [(VISIT, expression)]
+    while work:
+        kind, item = work.pop()
+        if kind == BIND:
+            bound.add(item)
+        elif kind == SAVE:
+            saved.append(set(bound))
+        elif kind == SWAP:
+            bound, saved[-1] = saved[-1], bound
+        elif kind == MEET:
+            bound &= saved.pop()
+        elif kind == RESTORE:
+            bound = saved.pop()
+        else:
+            match item:
+                case Variable(variable_name=variable_name):
+                    tags[id(item)] = tags[id(item)] and variable_name in bound
+                    bound.add(variable_name)
+                case Assign(variable=variable, value=value):
+                    work += [(BIND, variable.variable_name), (VISIT, value)]
+                case If(condition=condition, true=true, false=false):
+                    work += [(MEET, None), (VISIT, false), (SWAP, None),
+                             (VISIT, true), (SAVE, None), (VISIT, condition)]
+                case While(condition=condition, body=body):
+                    work += [(RESTORE, None), (VISIT, body),
+                             (SAVE, None), (VISIT, condition)]
+                case _:
+                    work.extend((VISIT, child) for child in reversed(children(item)))
+
+
+def mark_totality(expression: Expr, analysis: Analysis) -> None:
+    """
+    Tag every node with `total`: True when evaluating it is guaranteed to
+    finish without raising or changing the state, so skipping it cannot be
+    observed. Requires `pure`, `static_type`, `constant` and `bound` to be
+    tagged already.
+
+    Divisions can raise and loops may not terminate, so neither is total.
+    A node folded to a constant always is.
+    """
+    types, tags = analysis.static_type, analysis.total
+    for node in analysis.nodes:
+        subexpressions = children(node)
+        total = analysis.pure[id(node)] and known(types[id(node)]) and \
+            all(tags[id(child)] for child in subexpressions)
+        match node:
+            case Variable():
+                total = analysis.bound[id(node)]
+            case Not(expr=expr):
+                total = total and types[id(expr)] == BOOLEAN
+            case And(left=left, right=right) | Or(left=left, right=right):
+                total = total and types[id(left)] == BOOLEAN and types[id(right)] == BOOLEAN
+            case Lt(left=left, right=right) | Lte(left=left, right=right) | Gt(left=left, right=right) | \
+                    Gte(left=left, right=right) | Eq(left=left, right=right) | Ne(left=left, right=right):
+                total = total and known(types[id(left)]) and types[id(left)] == types[id(right)]
+            case If(condition=condition):
+                total = total and types[id(condition)] == BOOLEAN
+            case Divide() | While():
+                total = False
+        if analysis.constant[id(node)] is not None:
+            total = True
+        tags[id(node)] = total
+
+
+"""
+Constant folding
+"""
+
+
+def fold_constants(expression: Expr, analysis: Analysis) -> None:
+    """
+    Tag every node with `constant`: its `(value, type)` when it is built
+    only from literals, so it can be computed once at compile time, or None.
+    Requires `static_type` to be tagged already.
+
+    Only well-typed operators are folded, and a division by zero is left to
+    raise at runtime.
+    """
+    constants = analysis.constant
+    for node in analysis.nodes:
+        constant = None
+        match node:
+            case Ren():
+                constant = (None, UNIT)
+            case Literal(literal=literal) if known(analysis.static_type[id(node)]):
+                constant = (literal, analysis.static_type[id(node)])
+            case Not(expr=expr) if constants[id(expr)] is not None and \
+                    analysis.static_type[id(expr)] == BOOLEAN:
+                constant = (not_(constants[id(expr)][0]), BOOLEAN)
+            case BinaryOperator(left=left, right=right) if constants[id(left)] is not None and \
+                    constants[id(right)] is not None:
+                opcode, result_type = binary_instruction(node, analysis)
+                right_value = constants[id(right)][0]
+                if opcode in FOLDS and not (isinstance(node, Divide) and right_value == 0):
+                    constant = (FOLDS[opcode](constants[id(left)][0], right_value), result_type)
+        constants[id(node)] = constant
+
+
+"""
+Loop invariance
+"""
+
+# A memo hit replaces the subexpression's code with one instruction and a
+# miss costs two more, so smaller subexpressions are not worth a cell.
+MEMO_MIN_INSTRUCTIONS = 3
+
+
+def mark_invariants(expression: Expr, analysis: Analysis) -> None:
+    """
+    Give a `memoize` cell to every maximal pure subexpression inside a
+    While that reads no variable the loop assigns. Its value cannot change
+    while that loop runs, so it is computed once per entry to the loop and
+    then reused. Each While is tagged in `loop_memos` with the cells to
+    clear on entry: those of the outermost loop each subexpression is
+    invariant in. Requires `pure`, `constant` and `bound` to be tagged
+    already.
+    """
+    nodes = analysis.nodes
+    loops = [node for node in nodes if isinstance(node, While)]
+    if not loops:
+        return
+
+    # The names each node assigns and each pure node reads, and the number
+    # of instructions each node lowers to.
+    assigns = {}
+    reads = {}
+    sizes = {}
+    for node in nodes:
+        subexpressions = children(node)
+        assigns[id(node)] = set().union(*(assigns[id(child)] for child in subexpressions))
+        if isinstance(node, Assign):
+            assigns[id(node)].add(node.variable.variable_name)
+        if analysis.pure[id(node)]:
+            if isinstance(node, Variable):
+                reads[id(node)] = {node.variable_name}
+            else:
+                reads[id(node)] = set().union(*(reads[id(child)] for child in subexpressions))
+        if single_instruction(node, analysis):
+            sizes[id(node)] = 1
+        else:
+            sizes[id(node)] = 1 + sum(sizes[id(child)] for child in subexpressions)
+
+    # Walk down from the root with a stack of the enclosing loops, outermost
+    # first, and for each name the positions in it of the loops assigning
+    # that name. A loop assigns everything the loops inside it do, so a node
+    # is invariant in exactly the loops inside the innermost one assigning
+    # a name it reads, and the outermost of those owns its cell. Nodes
+    # inside a memoized one are covered by its cell. A node reached from
+    # several places is only memoized if every place agrees on its loop.
+    owners = {}
+    enclosing = []
+    assigned_at = {}
+    work = [(expression, False)]
+    while work:
+        node, covered = work.pop()
+        if node is None:
+            for variable_name in assigns[id(enclosing.pop())]:
+                assigned_at[variable_name].pop()
+            continue
+        owner = None
+        if not covered and analysis.pure[id(node)] and sizes[id(node)] >= MEMO_MIN_INSTRUCTIONS:
+            position = max((assigned_at[variable_name][-1] + 1 for variable_name in reads[id(node)]
+                            if assigned_at.get(variable_name)), default=0)
+            if position < len(enclosing):
+                owner = enclosing[position]
+        if id(node) in owners and owners[id(node)] is not owner:
+            owner = None
+        owners[id(node)] = owner
+        if isinstance(node, While):
+            for variable_name in assigns[id(node)]:
+                assigned_at.setdefault(variable_name, []).append(len(enclosing))
+            enclosing.append(node)
+            work.append((None, False))
+        work.extend((child, covered or owner is not None) for child in children(node))
+
+    for node_id, owner in owners.items():
+        if owner is not None:
+            cell = analysis.memoize[node_id] = len(analysis.memoize)
+            analysis.loop_memos.setdefault(id(owner), []).append(cell)
+
+
+"""
+Name resolution
+"""
+
+
+def resolve_names(expression: Expr, variable_names, analysis: Analysis) -> None:
+    """
+    Give every variable a dense integer slot, by name. Variables bound
+    before `expression` runs come first.
+    """
+    slots = analysis.slots
+    for variable_name in variable_names:
+        slots.setdefault(variable_name, len(slots))
+    for node in analysis.nodes:
+        match node:
+            case Assign(variable=variable):
+                slots.setdefault(variable.variable_name, len(slots))
+            case Variable(variable_name=variable_name):
+                slots.setdefault(variable_name, len(slots))
+
+
+"""
+Hot loops
+"""
+
+# A loop bounded by an integer literal at least this large is assumed to
+# run many times.
+MIN_ITERATIONS = 64
+
+
+def hot_loop(nodes: list) -> bool:
+    """
+    Whether the program with these `nodes`, in postorder, has a loop likely
+    to run many times: one nested in another loop, or one whose condition
+    compares against an integer literal of at least MIN_ITERATIONS.
+    """
+    if not any(isinstance(node, While) for node in nodes):
+        return False
+    contains_loop = {}
+    for node in nodes:
+        inner = any(contains_loop[id(child)] for child in children(node))
+        if isinstance(node, While):
+            condition = node.condition
+            if inner or isinstance(condition, (Lt, Lte, Gt, Gte, Eq, Ne)) and \
+                    any(isinstance(operand, IntLiteral) and abs(operand.literal) >= MIN_ITERATIONS
+                        for operand in (condition.left, condition.right)):
+                return True
+            inner = True
+        contains_loop[id(node)] = inner
+    return False
+
+
+def assume_nothing(analysis: Analysis) -> None:
+    """
+    Tag every node as no pass has found anything out about it, so it lowers
+    to the generic, checked instructions.
+    """
+    node_ids = [id(node) for node in analysis.nodes]
+    analysis.pure = dict.fromkeys(node_ids, False)
+    analysis.static_type = dict.fromkeys(node_ids)
+    analysis.constant = dict.fromkeys(node_ids)
+    analysis.bound = dict.fromkeys(node_ids, False)
+    analysis.total = dict.fromkeys(node_ids, False)
+
+
+"""
+Lowering
+"""
+
+
+class Code(object):
+    """
+    Compiled code: the opcode tape, the variable names, indexed by slot,
+    and the number of memo cells the tape uses.
+    """
+
+    __slots__ = ('ops', 'variable_names', 'memo_count')
+
+    def __init__(self, ops: list, variable_names: list, memo_count: int = 0) -> None:
+        self.ops = ops
+        self.variable_names = variable_names
+        self.memo_count = memo_count
+
+
+class Label(object):
+    def __init__(self) -> None:
+        self.position = None
+
+
+VISIT = 0
+VISIT_UNCACHED = 1
+EMIT = 2
+MARK = 3
+
+
+def analyse_expression(expression: Expr, variable_types: dict) -> Analysis:
+    """
+    Run every analysis pass over `expression`. The passes cost more than
+    they save on nodes evaluated only a few times, so unless the program
+    has a hot loop only names are resolved and nothing else is assumed.
+    """
+    analysis = Analysis(expression)
+    resolve_names(expression, variable_types, analysis)
+    analysis.hot = hot_loop(analysis.nodes)
+    if not analysis.hot:
+        assume_nothing(analysis)
+        return analysis
+    mark_purity(expression, analysis)
+    infer_types(expression, variable_types, analysis)
+    fold_constants(expression, analysis)
+    mark_bound(expression, variable_types, analysis)
+    mark_totality(expression, analysis)
+    mark_invariants(expression, analysis)
+    return analysis
+
+
+def compile_expression(expression: Expr, variable_types: Optional[dict] = None) -> Code:
+    """
+    Lower `expression` to a flat list of `(opcode, argument)` pairs. Running
+    the list leaves the value and type of `expression` on the stack.
+    """
+    return lower_expression(expression, analyse_expression(expression, variable_types or {}))
+
+
+def lower_expression(expression: Expr, analysis: Analysis) -> Code:
+    """
+    Lower an already analysed `expression`. See `compile_expression`.
+    """
+    # Each work item is a pre-order visit of a node, an instruction to emit
+    # or a label to bind at the current position. Visiting a node replaces
+    # it with its own work items, so the tape comes out in postorder without
+    # recursion.
+    ops = []
+    work = [(VISIT, expression)]
+    while work:
+        kind, item = work.pop()
+        if kind == VISIT:
+            work.extend(reversed(lower(item, analysis)))
+        elif kind == VISIT_UNCACHED:
+            work.extend(reversed(lower_uncached(item, analysis)))
+        elif kind == EMIT:
+            ops.append(item)
+        else:
+            item.position = len(ops)
+
+    return Code([(opcode, resolve(argument)) for opcode, argument in ops],
+                analysis.variable_names, len(analysis.memoize))
+
+
+def resolve(argument):
+    match argument:
+        case Label(position=position):
+            return position
+        case (operand, Label(position=position)):
+            return (operand, position)
+        case _:
+            return argument
+
+
+def lower(expression: Expr, analysis: Analysis) -> list:
+    constant = analysis.constant[id(expression)]
+    if constant is not None:
+        return [(EMIT, (OP_PUSH, constant))]
+    cell = analysis.memoize.get(id(expression))
+    if cell is not None:
+        # A cache hit at MEMO_BEGIN jumps past the subexpression's code.
+        end = Label()
+        return [(EMIT, (OP_MEMO_BEGIN, (cell, end))),
+                (VISIT_UNCACHED, expression),
+                (EMIT, (OP_MEMO_END, cell)),
+                (MARK, end)]
+    return lower_uncached(expression, analysis)
+
+
+def lower_uncached(expression: Expr, analysis: Analysis) -> list:
+    types, bound, slots = analysis.static_type, analysis.bound, analysis.slots
+    match expression:
+        case Ren():
+            return [(EMIT, (OP_PUSH, (None, UNIT)))]
+
+        case IntLiteral(literal=l):
+            return [(EMIT, (OP_PUSH, (l, INTEGER)))]
+
+        case FloatingPointLiteral(literal=l):
+            return [(EMIT, (OP_PUSH, (l, FLOATING_POINT)))]
+
+        case StringLiteral(literal=l):
+            return [(EMIT, (OP_PUSH, (l, STRING)))]
+
+        case BooleanLiteral(literal=l):
+            return [(EMIT, (OP_PUSH, (l, BOOLEAN)))]
+
+        case Print(to_print=to_print):
+            return [(VISIT, to_print),
+                    (EMIT, (OP_PRINT, None))]
+
+        case Sequence(exprs=exprs) | Program(exprs=exprs):
+            items = [(VISIT, exprs[0])]
+            for expr in exprs[1:]:
+                items += [(EMIT, (OP_POP, None)), (VISIT, expr)]
+            return items
+
+        case Variable(variable_name=variable_name) if bound[id(expression)]:
+            return [(EMIT, (OP_LOAD_BOUND, slots[variable_name]))]
+
+        case Variable(variable_name=variable_name):
+            return [(EMIT, (OP_LOAD, (slots[variable_name], variable_name)))]
+
+        case Assign(variable=variable, value=value):
+            slot = slots[variable.variable_name]
+            value_type = types[id(value)]
+            if known(value_type) and value_type == analysis.variable_types[variable.variable_name]:
+                return [(VISIT, value),
+                        (EMIT, (OP_STORE_TYPED, slot))]
+            return [(VISIT, value),
+                    (EMIT, (OP_STORE, slot))]
+
+        case Not(expr=expr):
+            if types[id(expr)] == BOOLEAN:
+                return [(VISIT, expr),
+                        (EMIT, (OP_NOT_BOOLEAN, BOOLEAN))]
+            return [(VISIT, expr),
+                    (EMIT, (OP_NOT, None))]
+
+        case And(left=left, right=right) | Or(left=left, right=right) \
+                if analysis.total[id(right)] and types[id(right)] == BOOLEAN:
+            # STIMPL does not short-circuit: both operands are always
+            # evaluated. When the right operand is a total Boolean, though,
+            # skipping it is unobservable, so jump past it once the left
+            # operand decides the result.
+            end = Label()
+            skip = OP_AND_SKIP if isinstance(expression, And) else OP_OR_SKIP
+            return [(VISIT, left),
+                    (EMIT, (skip, end)),
+                    (VISIT, right),
+                    (EMIT, binary_instruction(expression, analysis)),
+                    (MARK, end)]
+
+        case BinaryOperator(left=left, right=right):
+            instruction = slot_instruction(expression, analysis)
+            if instruction is not None:
+                return [(EMIT, instruction)]
+            opcode, result_type = binary_instruction(expression, analysis)
+            return [(VISIT, left),
+                    (VISIT, right),
+                    (EMIT, (opcode, result_type))]
+
+        case If(condition=condition, true=true, false=false):
+            otherwise, end = Label(), Label()
+            return [(VISIT, condition),
+                    (EMIT, (OP_BRANCH_IF, otherwise)),
+                    (VISIT, true),
+                    (EMIT, (OP_JUMP, end)),
+                    (MARK, otherwise),
+                    (VISIT, false),
+                    (MARK, end)]
+
+        case While(condition=condition, body=body):
+            # The condition is tested at the bottom: each iteration runs the
+            # body and then one conditional jump back, rather than a jump to
+            # the top and a branch out. A cheap condition is copied to the
+            # loop's entry:
+            #   condition; BRANCH end; top: body; POP; condition; LOOP top;
+            #   end: push False
+            # Any other is reached by one jump, so the tape stays linear in
+            # the program even when conditions nest loops:
+            #   JUMP test; top: body; POP; test: condition; LOOP top;
+            #   push False
+            top, end = Label(), Label()
+            cells = analysis.loop_memos.get(id(expression))
+            clear = [(EMIT, (OP_MEMO_CLEAR, tuple(cells)))] if cells else []
+            if cheap_condition(condition, analysis):
+                return [*clear,
+                        *lower_loop_test(condition, False, end, analysis),
+                        (MARK, top),
+                        (VISIT, body),
+                        (EMIT, (OP_POP, None)),
+                        *lower_loop_test(condition, True, top, analysis),
+                        (MARK, end),
+                        (EMIT, (OP_PUSH, (False, BOOLEAN)))]
+            test = Label()
+            return [*clear,
+                    (EMIT, (OP_JUMP, test)),
+                    (MARK, top),
+                    (VISIT, body),
+                    (EMIT, (OP_POP, None)),
+                    (MARK, test),
+                    *lower_loop_test(condition, True, top, analysis),
+                    (EMIT, (OP_PUSH, (False, BOOLEAN)))]
+
+        case _:
+            raise InterpSyntaxError("Unhandled!")
+
+
+COMPARISONS = {
+    OP_LT_TYPED: lt,
+    OP_LTE_TYPED: le,
+    OP_GT_TYPED: gt,
+    OP_GTE_TYPED: ge,
+    OP_EQ_TYPED: eq,
+    OP_NE_TYPED: ne,
+}
+
+OPERATORS = {
+    OP_ADD_TYPED: add,
+    OP_SUBTRACT_TYPED: sub,
+    OP_MULTIPLY_TYPED: mul,
+    **COMPARISONS,
+}
+
+def divide_integer(left: int, right: int) -> int:
+    """
+    Integer division rounding toward zero, as `int(left / right)` does, but
+    exact for integers too large for a float.
+    """
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+FOLDS = {
+    OP_DIVIDE_INTEGER: divide_integer,
+    OP_DIVIDE_FLOATING_POINT: truediv,
+    OP_AND_BOOLEAN: and_,
+    OP_OR_BOOLEAN: or_,
+    **OPERATORS,
+}
+
+
+def slot_instruction(expression: Expr, analysis: Analysis) -> Optional[tuple]:
+    """
+    A typed operator whose operands are a bound variable and a literal or
+    another bound variable reads its operands straight from their slots,
+    in one instruction. None for any other expression.
+    """
+    if not isinstance(expression, BinaryOperator):
+        return None
+    opcode, result_type = binary_instruction(expression, analysis)
+    if opcode not in OPERATORS:
+        return None
+    bound, slots = analysis.bound, analysis.slots
+    match (expression.left, expression.right):
+        case (Variable(variable_name=left_name) as left, Literal(literal=constant)) \
+                if bound[id(left)]:
+            return (OP_APPLY_SLOT_CONSTANT,
+                    (OPERATORS[opcode], slots[left_name], constant, result_type))
+        case (Variable(variable_name=left_name) as left, Variable(variable_name=right_name) as right) \
+                if bound[id(left)] and bound[id(right)]:
+            return (OP_APPLY_SLOT_SLOT,
+                    (OPERATORS[opcode], slots[left_name], slots[right_name], result_type))
+    return None
+
+
+def single_instruction(expression: Expr, analysis: Analysis) -> bool:
+    return analysis.constant[id(expression)] is not None or \
+        isinstance(expression, (Ren, Literal, Variable)) or \
+        slot_instruction(expression, analysis) is not None
+
+
+def cheap_condition(condition: Expr, analysis: Analysis) -> bool:
+    """
+    True when `condition` lowers to a single instruction, or to a fused
+    comparison of two such operands, so copying it costs next to nothing.
+    """
+    if single_instruction(condition, analysis):
+        return True
+    return isinstance(condition, BinaryOperator) and \
+        binary_instruction(condition, analysis)[0] in COMPARISONS and \
+        single_instruction(condition.left, analysis) and \
+        single_instruction(condition.right, analysis)
+
+
+def lower_loop_test(condition: Expr, jump_when: bool, target: Label, analysis: Analysis) -> list:
+    """
+    Test a While condition and jump to `target` when it is `jump_when`. A
+    statically typed comparison is fused with the jump into one compare-
+    and-branch instruction that never pushes the Boolean result.
+    """
+    if isinstance(condition, BinaryOperator):
+        opcode, _ = binary_instruction(condition, analysis)
+        if opcode in COMPARISONS:
+            fused = OP_COMPARE_LOOP if jump_when else OP_COMPARE_BRANCH
+            return [(VISIT, condition.left),
+                    (VISIT, condition.right),
+                    (EMIT, (fused, (COMPARISONS[opcode], target)))]
+    return [(VISIT, condition),
+            (EMIT, (OP_LOOP_WHILE if jump_when else OP_BRANCH_WHILE, target))]
+
+
+def binary_instruction(expression: BinaryOperator, analysis: Analysis) -> tuple:
+    """
+    When both operand types are known statically and valid for the
+    operator, emit a specialized instruction that skips the runtime type
+    checks. Otherwise emit the generic, checked instruction.
+    """
+    types = analysis.static_type
+    operands = types[id(expression.left)], types[id(expression.right)]
+    match (expression, *operands):
+        case (Add(), Integer() | FloatingPoint() | String() as operand_type, right_type) if operand_type == right_type:
+            return (OP_ADD_TYPED, operand_type)
+        case (Subtract(), Integer() | FloatingPoint() as operand_type, right_type) if operand_type == right_type:
+            return (OP_SUBTRACT_TYPED, operand_type)
+        case (Multiply(), Integer() | FloatingPoint() as operand_type, right_type) if operand_type == right_type:
+            return (OP_MULTIPLY_TYPED, operand_type)
+        case (Divide(), Integer(), Integer()):
+            return (OP_DIVIDE_INTEGER, INTEGER)
+        case (Divide(), FloatingPoint(), FloatingPoint()):
+            return (OP_DIVIDE_FLOATING_POINT, FLOATING_POINT)
+        case (And(), Boolean(), Boolean()):
+            return (OP_AND_BOOLEAN, BOOLEAN)
+        case (Or(), Boolean(), Boolean()):
+            return (OP_OR_BOOLEAN, BOOLEAN)
+        case (Lt() | Lte() | Gt() | Gte() | Eq() | Ne(), Integer() | Boolean() | String() | FloatingPoint() as operand_type, right_type) if operand_type == right_type:
+            return (comparison_opcode(expression), BOOLEAN)
+        case _:
+            return (binary_opcode(expression), None)
+
+
+def comparison_opcode(expression: BinaryOperator) -> int:
+    match expression:
+        case Lt():
+            return OP_LT_TYPED
+        case Lte():
+            return OP_LTE_TYPED
+        case Gt():
+            return OP_GT_TYPED
+        case Gte():
+            return OP_GTE_TYPED
+        case Eq():
+            return OP_EQ_TYPED
+        case _:
+            return OP_NE_TYPED
+
+
+def binary_opcode(expression: BinaryOperator) -> int:
+    match expression:
+        case Add():
+            return OP_ADD
+        case Subtract():
+            return OP_SUBTRACT
+        case Multiply():
+            return OP_MULTIPLY
+        case Divide():
+            return OP_DIVIDE
+        case And():
+            return OP_AND
+        case Or():
+            return OP_OR
+        case Lt():
+            return OP_LT
+        case Lte():
+            return OP_LTE
+        case Gt():
+            return OP_GT
+        case Gte():
+            return OP_GTE
+        case Eq():
+            return OP_EQ
+        case Ne():
+            return OP_NE
+        case _:
+            raise InterpSyntaxError("Unhandled!")
@@ -5,6 +5,8 @@ Expressions
 
 
 class Expr(object):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -15,6 +17,8 @@ Unit expression.
 
 
 class Ren(Expr):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -28,6 +32,8 @@ Literal expressions.
 
 
 class Literal(Expr):
+    __slots__ = ('literal',)
+
     def __init__(self, literal):
         self.literal = literal
 
@@ -36,6 +42,8 @@ class Literal(Expr):
 
 
 class IntLiteral(Literal):
+    __slots__ = ()
+
     def __init__(self, literal):
         if type(literal) != int:
             raise InterpTypeError(
@@ -44,6 +52,8 @@ class IntLiteral(Literal):
 
 
 class FloatingPointLiteral(Literal):
+    __slots__ = ()
+
     def __init__(self, literal):
         if type(literal) != float:
             raise InterpTypeError(
@@ -52,6 +62,8 @@ class FloatingPointLiteral(Literal):
 
 
 class StringLiteral(Literal):
+    __slots__ = ()
+
     def __init__(self, literal):
         if type(literal) != str:
             raise InterpTypeError(
@@ -60,6 +72,8 @@ class StringLiteral(Literal):
 
 
 class BooleanLiteral(Literal):
+    __slots__ = ()
+
     def __init__(self, literal):
         if type(literal) != bool:
             raise InterpTypeError(
@@ -73,6 +87,8 @@ Variable Expression
 
 
 class Variable(Expr):
+    __slots__ = ('variable_name',)
+
     def __init__(self, variable_name):
         self.variable_name = variable_name
 
@@ -89,6 +105,8 @@ Operators
 
 
 class Assign(Expr):
+    __slots__ = ('variable', 'value')
+
     def __init__(self, variable, value):
         if not isinstance(variable, Variable):
             raise InterpSyntaxError("Must assign to a variable.")
@@ -100,11 +118,15 @@ class Assign(Expr):
 
 
 class UnaryOperator(Expr):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
 
 class Print(UnaryOperator):
+    __slots__ = ('to_print',)
+
     def __init__(self, to_print):
         self.to_print = to_print
         super().__init__()
@@ -114,6 +136,8 @@ class Print(UnaryOperator):
 
 
 class Not(UnaryOperator):
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         self.expr = expr
         super().__init__()
@@ -123,6 +147,8 @@ class Not(UnaryOperator):
 
 
 class BinaryOperator(Expr):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
@@ -130,6 +156,8 @@ class BinaryOperator(Expr):
 
 
 class And(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -138,6 +166,8 @@ class And(BinaryOperator):
 
 
 class Or(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -146,6 +176,8 @@ class Or(BinaryOperator):
 
 
 class Lt(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -154,6 +186,8 @@ class Lt(BinaryOperator):
 
 
 class Lte(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -162,6 +196,8 @@ class Lte(BinaryOperator):
 
 
 class Gt(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -170,6 +206,8 @@ class Gt(BinaryOperator):
 
 
 class Gte(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -178,6 +216,8 @@ class Gte(BinaryOperator):
 
 
 class Eq(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -186,6 +226,8 @@ class Eq(BinaryOperator):
 
 
 class Ne(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -194,6 +236,8 @@ class Ne(BinaryOperator):
 
 
 class Add(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -202,6 +246,8 @@ class Add(BinaryOperator):
 
 
 class Subtract(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -210,6 +256,8 @@ class Subtract(BinaryOperator):
 
 
 class Multiply(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -218,6 +266,8 @@ class Multiply(BinaryOperator):
 
 
 class Divide(BinaryOperator):
+    __slots__ = ()
+
     def __init__(self, left, right):
         super().__init__(left, right)
 
@@ -231,6 +281,8 @@ Combining forms.
 
 
 class Program(Expr):
+    __slots__ = ('exprs',)
+
     def __init__(self, expr, *exprs):
         if expr is None:
             raise InterpSyntaxError("Cannot have a program with no expressions.")
@@ -241,6 +293,8 @@ class Program(Expr):
 
 
 class Sequence(Expr):
+    __slots__ = ('exprs',)
+
     def __init__(self, expr, *exprs):
         if expr is None:
             raise InterpSyntaxError("Cannot have a sequence with no expressions.")
@@ -251,6 +305,8 @@ class Sequence(Expr):
 
 
 class If(Expr):
+    __slots__ = ('condition', 'true', 'false')
+
     def __init__(self, condition, true, false):
         self.condition = condition
         self.true = true
@@ -261,6 +317,8 @@ class If(Expr):
 
 
 class While(Expr):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
@@ -0,0 +1,276 @@
+import ast
+from operator import lt, le, gt, ge, eq, ne
+from typing import Callable, Optional
+
+from stimpl.expression import *
+from stimpl.types import *
+from stimpl.errors import *
+from stimpl.compiler import *
+
+"""
+Native lowering
+
+A program whose every node has a known static type, whose reads are all
+definitely bound and whose assignments never change a variable's type cannot
+raise a type or binding error. Such a program is translated to a Python
+function and compiled by CPython, so it runs on the host's own eval loop with
+STIMPL variables as fast locals. Building and compiling the function costs
+far more than running a short program on the tape, so only programs with a
+hot loop, one likely to run many times, are translated. Anything else
+returns None and runs on the tape interpreter.
+"""
+
+MAX_DEPTH = 100
+
+ARITHMETIC = {
+    Add: ast.Add,
+    Subtract: ast.Sub,
+    Multiply: ast.Mult,
+    And: ast.BitAnd,
+    Or: ast.BitOr,
+}
+
+RELATIONS = {
+    Lt: (ast.Lt, lt),
+    Lte: (ast.LtE, le),
+    Gt: (ast.Gt, gt),
+    Gte: (ast.GtE, ge),
+    Eq: (ast.Eq, eq),
+    Ne: (ast.NotEq, ne),
+}
+
+
+def operator_entry(table: dict, expression: BinaryOperator):
+    """
+    The entry of `table` for the nearest class in the MRO of `expression`'s
+    class, or None. Subclasses resolved this way are cached in `table`.
+    """
+    node_class = type(expression)
+    if node_class not in table:
+        entry = next((table[base] for base in node_class.__mro__ if base in table), None)
+        if entry is None:
+            return None
+        table[node_class] = entry
+    return table[node_class]
+
+
+def lower_to_python(expression: Expr, analysis: Analysis, variable_types: dict) -> Optional[Callable]:
+    """
+    Translate an already analysed `expression` to a function from the
+    bindings it starts with to `(value, type, bindings)`, or return None when
+    the program may fail a runtime check.
+    """
+    variable_names = analysis.variable_names
+    slot_types = native_slot_types(expression, analysis, variable_types)
+    if slot_types is None:
+        return None
+
+    parameters = [f"v{slot}" for slot in range(len(variable_types))]
+    translator = Translator(analysis)
+    result = translator.lower(expression)
+    translator.body.append(ast.Return(ast.Tuple(
+        [result, ast.Call(ast.Name('locals', ast.Load()), [], [])], ast.Load())))
+    function = ast.FunctionDef(
+        name='stimpl_program',
+        args=ast.arguments(posonlyargs=[], args=[ast.arg(name) for name in parameters],
+                           kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=translator.body, decorator_list=[], returns=None)
+    module = ast.fix_missing_locations(ast.Module(body=[function], type_ignores=[]))
+    try:
+        code = compile(module, '<stimpl>', 'exec')
+    except (SyntaxError, RecursionError):
+        # CPython limits how deeply blocks may nest.
+        return None
+    namespace = {'divide_integer': divide_integer}
+    exec(code, namespace)
+    program = namespace['stimpl_program']
+    result_type = analysis.static_type[id(expression)]
+
+    def run(bindings: dict) -> tuple:
+        try:
+            value, frame = program(*(bindings[variable_name][0]
+                                     for variable_name in variable_names[:len(parameters)]))
+        except ZeroDivisionError:
+            raise InterpMathError
+        bindings = dict(bindings)
+        for slot, variable_name in enumerate(variable_names):
+            local = f"v{slot}"
+            if local in frame:
+                bindings[variable_name] = (frame[local], slot_types[slot])
+        return value, result_type, bindings
+
+    return run
+
+
+def native_slot_types(expression: Expr, analysis: Analysis, variable_types: dict) -> Optional[list]:
+    """
+    The single type each variable slot holds when `expression` can be lowered
+    natively and is worth it, otherwise None.
+    """
+    if not analysis.hot:
+        return None
+    types = analysis.static_type
+    slot_types = [variable_types.get(variable_name) for variable_name in analysis.variable_names]
+    depths = {}
+    for node in analysis.nodes:
+        subexpressions = children(node)
+        depth = 1 + max((depths[id(child)] for child in subexpressions), default=0)
+        if depth > MAX_DEPTH or not known(types[id(node)]):
+            return None
+        depths[id(node)] = depth
+        match node:
+            case Variable():
+                if not analysis.bound[id(node)]:
+                    return None
+            case Assign(variable=variable, value=value):
+                slot = analysis.slots[variable.variable_name]
+                if slot_types[slot] is None:
+                    slot_types[slot] = types[id(value)]
+                elif slot_types[slot] != types[id(value)]:
+                    return None
+            case Not(expr=expr):
+                if types[id(expr)] != BOOLEAN:
+                    return None
+            case If(condition=condition) | While(condition=condition):
+                if types[id(condition)] != BOOLEAN:
+                    return None
+            case BinaryOperator(left=left, right=right):
+                unit_comparison = operator_entry(RELATIONS, node) is not None and \
+                    types[id(left)] == UNIT == types[id(right)]
+                if binary_instruction(node, analysis)[1] is None and not unit_comparison:
+                    return None
+    return slot_types
+
+
+class Translator(object):
+    """
+    Lowers expressions to Python statements in A-normal form: every node's
+    side effects are appended to `body` in evaluation order and `lower`
+    returns a Python expression for its value.
+    """
+
+    def __init__(self, analysis: Analysis) -> None:
+        self.analysis = analysis
+        self.body = []
+        self.temporaries = 0
+
+    def temporary(self) -> str:
+        self.temporaries += 1
+        return f"t{self.temporaries}"
+
+    def assign(self, name: str, value: ast.expr) -> None:
+        self.body.append(ast.Assign([ast.Name(name, ast.Store())], value))
+
+    def atom(self, value: ast.expr) -> ast.expr:
+        """
+        `value`, evaluated now into a temporary unless it is already a name
+        or a constant.
+        """
+        if isinstance(value, (ast.Name, ast.Constant)):
+            return value
+        name = self.temporary()
+        self.assign(name, value)
+        return ast.Name(name, ast.Load())
+
+    def block(self, expression: Expr, result: Optional[str]) -> list:
+        """
+        The statements for `expression` as a separate block, storing its
+        value in `result` or discarding it.
+        """
+        outer, self.body = self.body, []
+        value = self.lower(expression)
+        if result is not None:
+            self.assign(result, value)
+        elif not isinstance(value, (ast.Name, ast.Constant)):
+            self.body.append(ast.Expr(value))
+        body, self.body = self.body, outer
+        return body or [ast.Pass()]
+
+    def operands(self, left: Expr, right: Expr) -> tuple:
+        """
+        Lower both operands. When the right operand emits statements they
+        could reassign a variable the left value reads, so the left value is
+        fixed in a temporary ahead of them.
+        """
+        left_value = self.lower(left)
+        mark = len(self.body)
+        right_value = self.lower(right)
+        if len(self.body) != mark and not isinstance(left_value, ast.Constant):
+            name = self.temporary()
+            self.body.insert(mark, ast.Assign([ast.Name(name, ast.Store())], left_value))
+            left_value = ast.Name(name, ast.Load())
+        return left_value, right_value
+
+    def lower(self, expression: Expr) -> ast.expr:
+        types, slots = self.analysis.static_type, self.analysis.slots
+        constant = self.analysis.constant[id(expression)]
+        if constant is not None:
+            return ast.Constant(constant[0])
+        match expression:
+            case Ren():
+                return ast.Constant(None)
+
+            case IntLiteral(literal=literal) | FloatingPointLiteral(literal=literal) | \
+                    StringLiteral(literal=literal) | BooleanLiteral(literal=literal):
+                return ast.Constant(literal)
+
+            case Variable(variable_name=variable_name):
+                return ast.Name(f"v{slots[variable_name]}", ast.Load())
+
+            case Assign(variable=variable, value=value):
+                name = f"v{slots[variable.variable_name]}"
+                self.assign(name, self.lower(value))
+                return ast.Name(name, ast.Load())
+
+            case Print(to_print=to_print):
+                value = self.atom(self.lower(to_print))
+                printed = ast.Constant("Unit") if types[id(to_print)] == UNIT else value
+                self.body.append(ast.Expr(ast.Call(ast.Name('print', ast.Load()), [printed], [])))
+                return value
+
+            case Sequence(exprs=exprs) | Program(exprs=exprs):
+                if not exprs:
+                    return ast.Constant(None)
+                for expr in exprs[:-1]:
+                    value = self.lower(expr)
+                    if not isinstance(value, (ast.Name, ast.Constant)):
+                        self.body.append(ast.Expr(value))
+                return self.lower(exprs[-1])
+
+            case Not(expr=expr):
+                return ast.UnaryOp(ast.Not(), self.lower(expr))
+
+            case Divide(left=left, right=right):
+                left_value, right_value = self.operands(left, right)
+                if types[id(left)] == INTEGER:
+                    return ast.Call(ast.Name('divide_integer', ast.Load()), [left_value, right_value], [])
+                return ast.BinOp(left_value, ast.Div(), right_value)
+
+            case BinaryOperator(left=left, right=right) if operator_entry(ARITHMETIC, expression) is not None:
+                left_value, right_value = self.operands(left, right)
+                return ast.BinOp(left_value, operator_entry(ARITHMETIC, expression)(), right_value)
+
+            case BinaryOperator(left=left, right=right):
+                left_value, right_value = self.operands(left, right)
+                operator, relation = operator_entry(RELATIONS, expression)
+                if types[id(left)] == UNIT:
+                    return ast.Constant(relation(0, 0))
+                return ast.Compare(left_value, [operator()], [right_value])
+
+            case If(condition=condition, true=true, false=false):
+                result = self.temporary()
+                test = self.lower(condition)
+                self.body.append(ast.If(test, self.block(true, result), self.block(false, result)))
+                return ast.Name(result, ast.Load())
+
+            case While(condition=condition, body=body):
+                outer, self.body = self.body, []
+                test = self.lower(condition)
+                self.body.append(ast.If(ast.UnaryOp(ast.Not(), test), [ast.Break()], []))
+                self.body.extend(self.block(body, None))
+                loop, self.body = self.body, outer
+                self.body.append(ast.While(ast.Constant(True), loop, []))
+                return ast.Constant(False)
+
+            case _:
+                raise InterpSyntaxError(f"Cannot lower {expression} to Python.")
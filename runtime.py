@@ -3,6 +3,8 @@ from typing import Any, Tuple, Optional
 from stimpl.expression import *
 from stimpl.types import *
 from stimpl.errors import *
+from stimpl.compiler import *
+from stimpl.native import *
 
 """
 Interpreter State
@@ -10,384 +12,597 @@ Interpreter State
 
 
 class State(object):
-    def __init__(self, variable_name: str, variable_value: Expr, variable_type: Type, next_state: 'State') -> None:
-        self.variable_name = variable_name
-        self.value = (variable_value, variable_type)
-        self.next_state = next_state
+    __slots__ = ('bindings',)
+
+    def __init__(self, bindings: Optional[dict] = None) -> None:
+        self.bindings = bindings if bindings is not None else {}
 
     def copy(self) -> 'State':
-        variable_value, variable_type = self.value
-        return State(self.variable_name, variable_value, variable_type, self.next_state)
+        return State(dict(self.bindings))
 
     def set_value(self, variable_name, variable_value, variable_type):
-        return State(variable_name, variable_value, variable_type, self)
+        bindings = dict(self.bindings)
+        bindings[variable_name] = (variable_value, variable_type)
+        return State(bindings)
 
     def get_value(self, variable_name) -> Any:
-        if self.variable_name == variable_name:
-            return self.value
-        return self.next_state.get_value(variable_name)
+        return self.bindings.get(variable_name)
 
     def __repr__(self) -> str:
-        return f"{self.variable_name}: {self.value}, " + repr(self.next_state)
+        return ", ".join(f"{variable_name}: {value}" for variable_name, value in self.bindings.items())
 
 
 class EmptyState(State):
+    __slots__ = ()
+
     def __init__(self):
-        pass
+        super().__init__({})
 
     def copy(self) -> 'EmptyState':
         return EmptyState()
 
-    def get_value(self, variable_name) -> None:
-        return None
 
-    def __repr__(self) -> str:
-        return ""
+"""
+Errors
+"""
+
+
+def mismatch(operation: str, verb: str, left_type: Type, right_type: Type) -> InterpTypeError:
+    # Only called on the failure path, so the message is never formatted
+    # for an operation that succeeds.
+    return InterpTypeError(f"""Mismatched types for {operation}:
+            Cannot {verb} {left_type} to {right_type}""")
 
 
 """
-Main evaluation logic!
+Evaluator
 """
 
 
-def evaluate(expression: Expr, state: State) -> Tuple[Optional[Any], Type, State]:
-    match expression:
-        case Ren():
-            return (None, Unit(), state)
-
-        case IntLiteral(literal=l):
-            return (l, Integer(), state)
+class Evaluator(object):
+    """
+    Runs compiled code. Operand values and types live on two parallel
+    stacks, and variables on two parallel lists indexed by the slots the
+    compiler resolved, so no handler allocates a tuple. A variable's type
+    is None while it is unbound. A State is only built once, when the run
+    finishes.
+    """
+
+    __slots__ = ('values', 'types', 'variable_names', 'variable_values', 'variable_types',
+                 'memo_values', 'memo_types')
+
+    def __init__(self, state: State, variable_names: list, memo_count: int = 0) -> None:
+        self.values = []
+        self.types = []
+        self.variable_names = variable_names
+        self.variable_values = [None] * len(variable_names)
+        self.variable_types = [None] * len(variable_names)
+        for slot, variable_name in enumerate(variable_names):
+            binding = state.get_value(variable_name)
+            if binding is not None:
+                self.variable_values[slot], self.variable_types[slot] = binding
+        # Memo cells, filled like variable slots. An empty cell's type is
+        # None.
+        self.memo_values = [None] * memo_count
+        self.memo_types = [None] * memo_count
+
+    def state(self) -> State:
+        return State({variable_name: (variable_value, variable_type)
+                      for variable_name, variable_value, variable_type
+                      in zip(self.variable_names, self.variable_values, self.variable_types)
+                      if variable_type is not None})
+
+    def run(self, ops: list) -> Tuple[Optional[Any], Type, State]:
+        # Split the tape into parallel handler/argument lists up front so
+        # each step is two list indexes and a call -- no tuple unpacking and
+        # no DISPATCH lookup inside the loop.
+        handlers = [DISPATCH[opcode] for opcode, _ in ops]
+        arguments = [argument for _, argument in ops]
+
+        pc = 0
+        end = len(ops)
+        while pc < end:
+            target = handlers[pc](self, arguments[pc])
+            pc = pc + 1 if target is None else target
+
+        return (self.values.pop(), self.types.pop(), self.state())
+
+    # Opcode handlers. A handler that returns a program counter transfers
+    # control there; one that returns None falls through.
+
+    def op_push(self, constant) -> None:
+        value, value_type = constant
+        self.values.append(value)
+        self.types.append(value_type)
+
+    def op_load(self, argument) -> None:
+        slot, variable_name = argument
+        variable_type = self.variable_types[slot]
+        if variable_type is None:
+            raise InterpSyntaxError(
+                f"Cannot read from {variable_name} before assignment.")
+        self.values.append(self.variable_values[slot])
+        self.types.append(variable_type)
+
+    def op_load_bound(self, slot) -> None:
+        self.values.append(self.variable_values[slot])
+        self.types.append(self.variable_types[slot])
+
+    def op_store(self, slot) -> None:
+        value_type = self.types[-1]
+        variable_type = self.variable_types[slot]
+
+        if variable_type is not None and value_type.TAG != variable_type.TAG:
+            raise mismatch("Assignment", "assign", value_type, variable_type)
+
+        self.variable_values[slot] = self.values[-1]
+        self.variable_types[slot] = value_type
+
+    def op_store_typed(self, slot) -> None:
+        self.variable_values[slot] = self.values[-1]
+        self.variable_types[slot] = self.types[-1]
+
+    def op_apply_slot_constant(self, argument) -> None:
+        apply, slot, constant, result_type = argument
+        self.values.append(apply(self.variable_values[slot], constant))
+        self.types.append(result_type)
+
+    def op_apply_slot_slot(self, argument) -> None:
+        apply, left_slot, right_slot, result_type = argument
+        self.values.append(apply(self.variable_values[left_slot], self.variable_values[right_slot]))
+        self.types.append(result_type)
+
+    def op_print(self, _) -> None:
+        match self.types[-1]:
+            case Unit():
+                print("Unit")
+            case _:
+                print(f"{self.values[-1]}")
+
+    def op_pop(self, _) -> None:
+        self.values.pop()
+        self.types.pop()
+
+    def op_add(self, _) -> None:
+        right_result, right_type = self.values.pop(), self.types.pop()
+        left_result, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Add", "add", left_type, right_type)
+
+        match left_type:
+            case Integer() | String() | FloatingPoint():
+                self.values[-1] = left_result + right_result
+            case _:
+                raise InterpTypeError(f"""Cannot add {left_type}s""")
+
+    def op_subtract(self, _) -> None:
+        right_result, right_type = self.values.pop(), self.types.pop()
+        left_result, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Subtract", "subtract", left_type, right_type)
+
+        match left_type:
+            case Integer() | FloatingPoint():
+                self.values[-1] = left_result - right_result
+            case _:
+                raise InterpTypeError(f"""Cannot subtract {left_type}s""")
+
+    def op_multiply(self, _) -> None:
+        right_result, right_type = self.values.pop(), self.types.pop()
+        left_result, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Multiply", "multiply", left_type, right_type)
+
+        match left_type:
+            case Integer() | FloatingPoint():
+                self.values[-1] = left_result * right_result
+            case _:
+                raise InterpTypeError(f"""Cannot multiply {left_type}s""")
+
+    def op_divide(self, _) -> None:
+        right_result, right_type = self.values.pop(), self.types.pop()
+        left_result, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Divide", "divide", left_type, right_type)
+
+        match left_type:
+            case Integer() | FloatingPoint() if right_result == 0:
+                raise InterpMathError
+            case Integer():
+                result = divide_integer(left_result, right_result)
+            case FloatingPoint():
+                result = left_result / right_result
+            case _:
+                raise InterpTypeError(f"""Cannot divide {left_type}s""")
+
+        self.values[-1] = result
+
+    def op_and(self, _) -> None:
+        right_value, right_type = self.values.pop(), self.types.pop()
+        left_value, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("And", "add", left_type, right_type)
+        match left_type:
+            case Boolean():
+                self.values[-1] = left_value and right_value
+            case _:
+                raise InterpTypeError(
+                    "Cannot perform logical and on non-boolean operands.")
+
+    def op_or(self, _) -> None:
+        right_value, right_type = self.values.pop(), self.types.pop()
+        left_value, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Or", "compare", left_type, right_type)
+        match left_type:
+            case Boolean():
+                self.values[-1] = left_value or right_value
+            case _:
+                raise InterpTypeError(
+                    "Cannot perform logical or on non-boolean operands.")
+
+    def op_not(self, _) -> None:
+        match self.types[-1]:
+            case Boolean():
+                self.values[-1] = not self.values[-1]
+            case _:
+                raise InterpTypeError(
+                    "Cannot perform logical not on non-boolean operand.")
+
+    def op_lt(self, _) -> None:
+        right_value, right_type = self.values.pop(), self.types.pop()
+        left_value, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Lt", "compare", left_type, right_type)
+
+        match left_type:
+            case Integer() | Boolean() | String() | FloatingPoint():
+                result = left_value < right_value
+            case Unit():
+                result = False
+            case _:
+                raise InterpTypeError(
+                    f"Cannot perform < on {left_type} type.")
+
+        self.values[-1] = result
+        self.types[-1] = BOOLEAN
+
+    def op_lte(self, _) -> None:
+        right_value, right_type = self.values.pop(), self.types.pop()
+        left_value, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Lte", "compare", left_type, right_type)
+
+        match left_type:
+            case Integer() | Boolean() | String() | FloatingPoint():
+                result = left_value <= right_value
+            case Unit():
+                result = True
+            case _:
+                raise InterpTypeError(
+                    f"Cannot perform <= on {left_type} type.")
+
+        self.values[-1] = result
+        self.types[-1] = BOOLEAN
+
+    def op_gt(self, _) -> None:
+        right_value, right_type = self.values.pop(), self.types.pop()
+        left_value, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Gt", "compare", left_type, right_type)
+
+        match left_type:
+            case Integer() | Boolean() | String() | FloatingPoint():
+                result = left_value > right_value
+            case Unit():
+                result = False
+            case _:
+                raise InterpTypeError(
+                    f"Cannot perform > on {left_type} type.")
+
+        self.values[-1] = result
+        self.types[-1] = BOOLEAN
+
+    def op_gte(self, _) -> None:
+        right_value, right_type = self.values.pop(), self.types.pop()
+        left_value, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Gte", "compare", left_type, right_type)
+
+        match left_type:
+            case Integer() | Boolean() | String() | FloatingPoint():
+                result = left_value >= right_value
+            case Unit():
+                result = True
+            case _:
+                raise InterpTypeError(
+                    f"Cannot perform >= on {left_type} type.")
+
+        self.values[-1] = result
+        self.types[-1] = BOOLEAN
+
+    def op_eq(self, _) -> None:
+        right_value, right_type = self.values.pop(), self.types.pop()
+        left_value, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Eq", "compare", left_type, right_type)
+
+        match left_type:
+            case Integer() | Boolean() | String() | FloatingPoint():
+                result = left_value == right_value
+            case Unit():
+                result = True
+            case _:
+                raise InterpTypeError(
+                    f"Cannot perform == on {left_type} type.")
+
+        self.values[-1] = result
+        self.types[-1] = BOOLEAN
+
+    def op_ne(self, _) -> None:
+        right_value, right_type = self.values.pop(), self.types.pop()
+        left_value, left_type = self.values[-1], self.types[-1]
+
+        if left_type.TAG != right_type.TAG:
+            raise mismatch("Ne", "compare", left_type, right_type)
+
+        match left_type:
+            case Integer() | Boolean() | String() | FloatingPoint():
+                result = left_value != right_value
+            case Unit():
+                result = False
+            case _:
+                raise InterpTypeError(
+                    f"Cannot perform != on {left_type} type.")
+
+        self.values[-1] = result
+        self.types[-1] = BOOLEAN
+
+    # Both operands of a typed handler are statically known to have the
+    # same valid type, so the left operand's type slot is already correct
+    # for arithmetic and only the comparisons need to overwrite it.
+
+    def op_add_typed(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] + right_value
+
+    def op_subtract_typed(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] - right_value
+
+    def op_multiply_typed(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] * right_value
+
+    def op_divide_integer(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        if right_value == 0:
+            raise InterpMathError
+        self.values[-1] = divide_integer(self.values[-1], right_value)
+
+    def op_divide_floating_point(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        if right_value == 0:
+            raise InterpMathError
+        self.values[-1] = self.values[-1] / right_value
+
+    def op_and_boolean(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] and right_value
+
+    def op_or_boolean(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] or right_value
+
+    def op_not_boolean(self, result_type) -> None:
+        self.values[-1] = not self.values[-1]
+
+    def op_lt_typed(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] < right_value
+        self.types[-1] = result_type
+
+    def op_lte_typed(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] <= right_value
+        self.types[-1] = result_type
+
+    def op_gt_typed(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] > right_value
+        self.types[-1] = result_type
+
+    def op_gte_typed(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] >= right_value
+        self.types[-1] = result_type
+
+    def op_eq_typed(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] == right_value
+        self.types[-1] = result_type
+
+    def op_ne_typed(self, result_type) -> None:
+        self.types.pop()
+        right_value = self.values.pop()
+        self.values[-1] = self.values[-1] != right_value
+        self.types[-1] = result_type
+
+    def op_and_skip(self, target) -> Optional[int]:
+        # A Boolean false left operand decides And; anything else falls
+        # through so the And handler can check the operand types.
+        if self.values[-1] is False and self.types[-1].TAG == Boolean.TAG:
+            return target
+        return None
 
-        case FloatingPointLiteral(literal=l):
-            return (l, FloatingPoint(), state)
+    def op_or_skip(self, target) -> Optional[int]:
+        if self.values[-1] is True and self.types[-1].TAG == Boolean.TAG:
+            return target
+        return None
 
-        case StringLiteral(literal=l):
-            return (l, String(), state)
-
-        case BooleanLiteral(literal=l):
-            return (l, Boolean(), state)
-
-        case Print(to_print=to_print):
-            printable_value, printable_type, new_state = evaluate(
-                to_print, state)
-
-            match printable_type:
-                case Unit():
-                    print("Unit")
-                case _:
-                    print(f"{printable_value}")
-
-            return (printable_value, printable_type, new_state)
-
-        case Sequence(exprs=exprs) | Program(exprs=exprs):
-            """ TODO: Implement. """
-            for expr in exprs:
-                value, expr_type, state = evaluate(expr, state)
-            return(value, expr_type, state)
-
-        case Variable(variable_name=variable_name):
-            value = state.get_value(variable_name)
-            if value == None:
-                raise InterpSyntaxError(
-                    f"Cannot read from {variable_name} before assignment.")
-            variable_value, variable_type = value
-            return (variable_value, variable_type, state)
-
-        case Assign(variable=variable, value=value):
-
-            value_result, value_type, new_state = evaluate(value, state)
-
-            variable_from_state = new_state.get_value(variable.variable_name)
-            _, variable_type = variable_from_state if variable_from_state else (
-                None, None)
-
-            if value_type != variable_type and variable_type != None:
-                raise InterpTypeError(f"""Mismatched types for Assignment:
-            Cannot assign {value_type} to {variable_type}""")
-
-            new_state = new_state.set_value(
-                variable.variable_name, value_result, value_type)
-            return (value_result, value_type, new_state)
-
-        case Add(left=left, right=right):
-            result = 0
-            left_result, left_type, new_state   = evaluate(left, state)
-            right_result, right_type, new_state = evaluate(right, new_state)
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Add:
-            Cannot add {left_type} to {right_type}""")
-
-            match left_type:
-                case Integer() | String() | FloatingPoint():
-                    result = left_result + right_result
-                case _:
-                    raise InterpTypeError(f"""Cannot add {left_type}s""")
-
-            return (result, left_type, new_state)
-
-        case Subtract(left=left, right=right):
-            result = 0
-            left_result, left_type, new_state = evaluate(left, state)
-            right_result, right_type, new_state = evaluate(right, new_state)
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Subtract:
-            Cannot subtract {left_type} to {right_type}""")
-
-            match left_type:
-                case Integer() | FloatingPoint():
-                    result = left_result - right_result
-                case _:
-                    raise InterpTypeError(f"""Cannot subtract {left_type}s""")
-
-            return (result, left_type, new_state)
-
-        case Multiply(left=left, right=right):
-            result = 0
-            left_result, left_type, new_state = evaluate(left, state)
-            right_result, right_type, new_state = evaluate(right, new_state)
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Multiply:
-            Cannot multiply {left_type} to {right_type}""")
-
-            match left_type:
-                case Integer() | FloatingPoint():
-                    result = left_result * right_result
-                case _:
-                    raise InterpTypeError(f"""Cannot multiply {left_type}s""")
-
-            return (result, left_type, new_state)
-
-        case Divide(left=left, right=right):
-            left_result, left_type, new_state   = evaluate(left, state)
-            right_result, right_type, new_state = evaluate(right, new_state)
-            
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Divide:
-            Cannot divide {left_type} to {right_type}""")
-            if right_result == 0 or right_result == 0.0:
-                raise InterpMathError
+    def op_jump(self, target) -> int:
+        return target
 
-            match left_type:
-                case Integer():
-                    if right_result != 0 or right_result != 0.0:
-                        result = left_result / right_result
-                        result = int(result)
-                case FloatingPoint():
-                    if right_result != 0 or right_result != 0.0:
-                        result = left_result / right_result
-                case _:
-                    raise InterpTypeError(f"""Cannot divide {left_type}s""")
-
-            return (result, left_type, new_state)
-
-        case And(left=left, right=right):
-            left_value, left_type, new_state   = evaluate(left, state)
-            right_value, right_type, new_state = evaluate(right, new_state)
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for And:
-            Cannot add {left_type} to {right_type}""")
-            match left_type:
-                case Boolean():
-                    result = left_value and right_value
-                case _:
-                    raise InterpTypeError(
-                        "Cannot perform logical and on non-boolean operands.")
-
-            return (result, left_type, new_state)
-
-        case Or(left=left, right=right):
-            left_value, left_type, new_state   = evaluate(left, state)
-            right_value, right_type, new_state = evaluate(right, new_state)
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Or:
-            Cannot compare {left_type} to {right_type}""")
-            match left_type:
-                case Boolean():
-                    result = left_value or right_value
-                case _:
-                    raise InterpTypeError(
-                        "Cannot perform logical or on non-boolean operands.")
-            return (result, left_type, new_state)
-
-        case Not(expr=expr):
-            expr_value, expr_type, new_state = evaluate(expr, state)
-            match expr_type:
-                case Boolean():
-                    result = not expr_value
-                case _:
-                    raise InterpTypeError(
-                        "Cannot perform logical not on non-boolean operand.")
-            return(result, expr_type, new_state)
-            
-        case If(condition=condition, true=true, false=false):
-            condition_value, condition_type, new_state = evaluate(condition, state)
-
-            result = None
-
-            match condition_type:
-                case Boolean():
-                    if condition_value:
-                        true_value, true_type, new_state = evaluate(true, new_state)
-                        result = true_value
-                        return(result, true_type, new_state)
-                    else:
-                        false_value, false_type, new_state = evaluate(false, new_state)
-                        result = false_value
-                        return(result, false_type, new_state)
-                case _:
-                    raise InterpTypeError(f"""Invalid type for if condition: 
+    def op_branch_if(self, target) -> Optional[int]:
+        condition_value, condition_type = self.values.pop(), self.types.pop()
+
+        match condition_type:
+            case Boolean():
+                return None if condition_value else target
+            case _:
+                raise InterpTypeError(f"""Invalid type for if condition: 
                 Cannot use {condition_type}""")
 
-        case Lt(left=left, right=right):
-            left_value, left_type, new_state = evaluate(left, state)
-            right_value, right_type, new_state = evaluate(right, new_state)
-
-            result = None
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Lt:
-            Cannot compare {left_type} to {right_type}""")
-
-            match left_type:
-                case Integer() | Boolean() | String() | FloatingPoint():
-                    result = left_value < right_value
-                case Unit():
-                    result = False
-                case _:
-                    raise InterpTypeError(
-                        f"Cannot perform < on {left_type} type.")
-
-            return (result, Boolean(), new_state)
-
-        case Lte(left=left, right=right):
-            left_value, left_type, new_state = evaluate(left, state)
-            right_value, right_type, new_state = evaluate(right, new_state)
-
-            result = None
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Lte:
-            Cannot compare {left_type} to {right_type}""")
-            
-            match left_type:
-                case Integer() | Boolean() | String() | FloatingPoint():
-                    result = left_value <= right_value
-                case Unit():
-                    result = True
-                case _:
-                    raise InterpTypeError(
-                        f"Cannot perform <= on {left_type} type.")
-            
-            return (result, Boolean(), new_state)
-
-        case Gt(left=left, right=right):
-            left_value, left_type, new_state = evaluate(left, state)
-            right_value, right_type, new_state = evaluate(right, new_state)
-
-            result = None
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Gt:
-            Cannot compare {left_type} to {right_type}""")
-
-            match left_type:
-                case Integer() | Boolean() | String() | FloatingPoint():
-                    result = left_value > right_value
-                case Unit():
-                    result = False
-                case _:
-                    raise InterpTypeError(
-                        f"Cannot perform > on {left_type} type.")
-            
-            return (result, Boolean(), new_state)
-
-        case Gte(left=left, right=right):
-            left_value, left_type, new_state = evaluate(left, state)
-            right_value, right_type, new_state = evaluate(right, new_state)
-
-            result = None
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Gte:
-            Cannot compare {left_type} to {right_type}""")
-            
-            match left_type:
-                case Integer() | Boolean() | String() | FloatingPoint():
-                    result = left_value >= right_value
-                case Unit():
-                    result = True
-                case _:
-                    raise InterpTypeError(
-                        f"Cannot perform >= on {left_type} type.")
-            
-            return (result, Boolean(), new_state)
-
-        case Eq(left=left, right=right):
-            left_value, left_type, new_state = evaluate(left, state)
-            right_value, right_type, new_state = evaluate(right, new_state)
-
-            result = None
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Eq:
-            Cannot compare {left_type} to {right_type}""")
-
-            match left_type:
-                case Integer() | Boolean() | String() | FloatingPoint():
-                    result = left_value == right_value
-                case Unit():
-                    result = True
-                case _:
-                    raise InterpTypeError(
-                        f"Cannot perform == on {left_type} type.")
-                
-            return (result, Boolean(), new_state)
-
-        case Ne(left=left, right=right):
-            left_value, left_type, new_state = evaluate(left, state)
-            right_value, right_type, new_state = evaluate(right, new_state)
-
-            result = None
-
-            if left_type != right_type:
-                raise InterpTypeError(f"""Mismatched types for Ne:
-            Cannot compare {left_type} to {right_type}""")
-
-            match left_type:
-                case Integer() | Boolean() | String() | FloatingPoint():
-                    result = left_value != right_value
-                case Unit():
-                    result = False
-                case _:
-                    raise InterpTypeError(
-                        f"Cannot perform != on {left_type} type.")
-                
-            return (result, Boolean(), new_state)
-
-        case While(condition=condition, body=body):
-            condition_value, condition_type, new_state = evaluate(condition, state)
-
-            result = None 
-            match condition_type:
-                case Boolean():
-                    pass
-                case _:
-                    raise InterpTypeError(f"""Invalid type for while condition: 
-                                                Cannot use {condition_type}""")
-            while condition_value:
-                body_value, body_type, new_state = evaluate(body, new_state)
-                condition_value, condition_type, new_state = evaluate(condition, new_state)
-            return(False, condition_type, new_state)
-
-
-        case _:
-            raise InterpSyntaxError("Unhandled!")
-    pass
+    def op_branch_while(self, target) -> Optional[int]:
+        condition_value, condition_type = self.values.pop(), self.types.pop()
+
+        match condition_type:
+            case Boolean():
+                return None if condition_value else target
+            case _:
+                raise InterpTypeError(f"""Invalid type for while condition: 
+                                        Cannot use {condition_type}""")
+
+    def op_loop_while(self, target) -> Optional[int]:
+        condition_value, condition_type = self.values.pop(), self.types.pop()
+
+        match condition_type:
+            case Boolean():
+                return target if condition_value else None
+            case _:
+                raise InterpTypeError(f"""Invalid type for while condition: 
+                                        Cannot use {condition_type}""")
+
+    def op_compare_branch(self, argument) -> Optional[int]:
+        compare, target = argument
+        self.types.pop()
+        self.types.pop()
+        right_value = self.values.pop()
+        return None if compare(self.values.pop(), right_value) else target
+
+    def op_compare_loop(self, argument) -> Optional[int]:
+        compare, target = argument
+        self.types.pop()
+        self.types.pop()
+        right_value = self.values.pop()
+        return target if compare(self.values.pop(), right_value) else None
+
+    def op_memo_begin(self, argument) -> Optional[int]:
+        # (Cache reading) A loop-invariant expression has the same value
+        # until its loop is entered again, so reuse the cell and skip its
+        # code.
+        cell, end = argument
+        memo_type = self.memo_types[cell]
+        if memo_type is not None:
+            self.values.append(self.memo_values[cell])
+            self.types.append(memo_type)
+            return end
+        return None
+
+    def op_memo_end(self, cell) -> None:
+        self.memo_values[cell] = self.values[-1]
+        self.memo_types[cell] = self.types[-1]
+
+    def op_memo_clear(self, cells) -> None:
+        for cell in cells:
+            self.memo_types[cell] = None
+
+
+_handlers = {
+    OP_PUSH: Evaluator.op_push,
+    OP_LOAD: Evaluator.op_load,
+    OP_STORE: Evaluator.op_store,
+    OP_PRINT: Evaluator.op_print,
+    OP_POP: Evaluator.op_pop,
+    OP_ADD: Evaluator.op_add,
+    OP_SUBTRACT: Evaluator.op_subtract,
+    OP_MULTIPLY: Evaluator.op_multiply,
+    OP_DIVIDE: Evaluator.op_divide,
+    OP_AND: Evaluator.op_and,
+    OP_OR: Evaluator.op_or,
+    OP_NOT: Evaluator.op_not,
+    OP_LT: Evaluator.op_lt,
+    OP_LTE: Evaluator.op_lte,
+    OP_GT: Evaluator.op_gt,
+    OP_GTE: Evaluator.op_gte,
+    OP_EQ: Evaluator.op_eq,
+    OP_NE: Evaluator.op_ne,
+    OP_JUMP: Evaluator.op_jump,
+    OP_BRANCH_IF: Evaluator.op_branch_if,
+    OP_BRANCH_WHILE: Evaluator.op_branch_while,
+    OP_MEMO_BEGIN: Evaluator.op_memo_begin,
+    OP_MEMO_END: Evaluator.op_memo_end,
+    OP_ADD_TYPED: Evaluator.op_add_typed,
+    OP_SUBTRACT_TYPED: Evaluator.op_subtract_typed,
+    OP_MULTIPLY_TYPED: Evaluator.op_multiply_typed,
+    OP_DIVIDE_INTEGER: Evaluator.op_divide_integer,
+    OP_DIVIDE_FLOATING_POINT: Evaluator.op_divide_floating_point,
+    OP_AND_BOOLEAN: Evaluator.op_and_boolean,
+    OP_OR_BOOLEAN: Evaluator.op_or_boolean,
+    OP_NOT_BOOLEAN: Evaluator.op_not_boolean,
+    OP_LT_TYPED: Evaluator.op_lt_typed,
+    OP_LTE_TYPED: Evaluator.op_lte_typed,
+    OP_GT_TYPED: Evaluator.op_gt_typed,
+    OP_GTE_TYPED: Evaluator.op_gte_typed,
+    OP_EQ_TYPED: Evaluator.op_eq_typed,
+    OP_NE_TYPED: Evaluator.op_ne_typed,
+    OP_AND_SKIP: Evaluator.op_and_skip,
+    OP_OR_SKIP: Evaluator.op_or_skip,
+    OP_LOOP_WHILE: Evaluator.op_loop_while,
+    OP_COMPARE_BRANCH: Evaluator.op_compare_branch,
+    OP_COMPARE_LOOP: Evaluator.op_compare_loop,
+    OP_LOAD_BOUND: Evaluator.op_load_bound,
+    OP_APPLY_SLOT_CONSTANT: Evaluator.op_apply_slot_constant,
+    OP_APPLY_SLOT_SLOT: Evaluator.op_apply_slot_slot,
+    OP_STORE_TYPED: Evaluator.op_store_typed,
+    OP_MEMO_CLEAR: Evaluator.op_memo_clear,
+}
+
+# Indexed directly by opcode.
+DISPATCH = tuple(_handlers[opcode] for opcode in range(len(_handlers)))
+
+
+"""
+Main evaluation logic!
+"""
+
+
+def evaluate_compiled(code: Code, state: State) -> Tuple[Optional[Any], Type, State]:
+    return Evaluator(state, code.variable_names, code.memo_count).run(code.ops)
+
+
+def evaluate(expression: Expr, state: State) -> Tuple[Optional[Any], Type, State]:
+    variable_types = {variable_name: variable_type
+                      for variable_name, (_, variable_type) in state.bindings.items()}
+    analysis = analyse_expression(expression, variable_types)
+    program = lower_to_python(expression, analysis, variable_types)
+    if program is not None:
+        value, value_type, bindings = program(state.bindings)
+        return value, value_type, State(bindings)
+    return evaluate_compiled(lower_expression(expression, analysis), state)
 
 
 def run_stimpl(program, debug=False):
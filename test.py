@@ -449,6 +449,157 @@ def run_stimpl_sanity_tests():
         check_equal((10, Integer()), run_state.get_value("i"))
         check_equal((10, Integer()), run_state.get_value("j"))
 
+        # A pure expression that is evaluated again must see assignments
+        # made since it was last evaluated.
+        # i = 1; j = i + i; i = 2; i + i
+        double_i = Add(Variable("i"), Variable("i"))
+        program = Program(Assign(Variable("i"), IntLiteral(1)),
+                          Assign(Variable("j"), double_i),
+                          Assign(Variable("i"), IntLiteral(2)),
+                          double_i)
+        run_value, run_type, run_state = run_stimpl(program)
+        check_equal((4, Integer()), (run_value, run_type))
+        check_equal((2, Integer()), run_state.get_value("j"))
+
+        # An expression that does not change inside a loop must still be
+        # recomputed when an outer loop changes what it reads. (x has no
+        # single static type, so this runs on the tape interpreter.)
+        # i = 0; s = 0
+        # while (i < 3) { j = 0; while (j < 2) { s = s + (i * 10 + i * i); j = j + 1 }; i = i + 1 }
+        program = Program(If(BooleanLiteral(False),
+                             Assign(Variable("x"), IntLiteral(1)),
+                             Assign(Variable("x"), StringLiteral("x"))),
+                          Assign(Variable("i"), IntLiteral(0)),
+                          Assign(Variable("s"), IntLiteral(0)),
+                          While(Lt(Variable("i"), IntLiteral(3)), Sequence(
+                              Assign(Variable("j"), IntLiteral(0)),
+                              While(Lt(Variable("j"), IntLiteral(2)), Sequence(
+                                  Assign(Variable("s"), Add(Variable("s"), Add(
+                                      Multiply(Variable("i"), IntLiteral(10)),
+                                      Multiply(Variable("i"), Variable("i"))))),
+                                  Assign(Variable("j"), Add(Variable("j"), IntLiteral(1))))),
+                              Assign(Variable("i"), Add(Variable("i"), IntLiteral(1))))),
+                          Variable("s"))
+        check_run_result((70, Integer(), None), run_stimpl(program))
+
+        # A variable assigned on only one branch, or only in a loop body,
+        # may still be unbound afterwards.
+        program = Program(If(BooleanLiteral(False),
+                             Assign(Variable("i"), IntLiteral(1)),
+                             Ren()),
+                          Variable("i"))
+        check_program_raises(InterpSyntaxError(), program)
+
+        program = Program(While(BooleanLiteral(False),
+                                Assign(Variable("i"), IntLiteral(1))),
+                          Variable("i"))
+        check_program_raises(InterpSyntaxError(), program)
+
+        # Integer division is exact, even beyond floating-point precision.
+        program = Divide(IntLiteral(10**18 + 1), IntLiteral(1))
+        check_run_result((10**18 + 1, Integer(), None), run_stimpl(program))
+
+        # Integer division rounds toward zero.
+        program = Divide(IntLiteral(-7), IntLiteral(2))
+        check_run_result((-3, Integer(), None), run_stimpl(program))
+
+        program = Program(Assign(Variable("i"), IntLiteral(7)),
+                          Assign(Variable("j"), IntLiteral(-2)),
+                          Divide(Variable("i"), Variable("j")))
+        check_run_result((-3, Integer(), None), run_stimpl(program))
+
+        # Dividing booleans is a type error, even by false.
+        program = Divide(BooleanLiteral(True), BooleanLiteral(False))
+        check_program_raises(InterpTypeError(), program)
+
+        # There is no short-circuit evaluation: the right operand's side
+        # effects and errors still happen when the left operand decides.
+        program = Program(And(BooleanLiteral(False),
+                              Assign(Variable("i"), BooleanLiteral(True))),
+                          Or(BooleanLiteral(True),
+                             Assign(Variable("j"), BooleanLiteral(False))))
+        run_value, run_type, run_state = run_stimpl(program)
+        check_equal((True, Boolean()), (run_value, run_type))
+        check_equal((True, Boolean()), run_state.get_value("i"))
+        check_equal((False, Boolean()), run_state.get_value("j"))
+
+        program = And(BooleanLiteral(False), Variable("i"))
+        check_program_raises(InterpSyntaxError(), program)
+
+        program = Or(BooleanLiteral(True), Eq(IntLiteral(1), Ren()))
+        check_program_raises(InterpTypeError(), program)
+
+        check_run_result((False, Boolean(), None), run_stimpl(
+            And(BooleanLiteral(False), Lt(IntLiteral(1), IntLiteral(2)))))
+
+        # A read of a variable is not affected by a later assignment in the
+        # same expression, and errors inside well-typed loops are still
+        # reported as interpreter errors. (The loops are long enough to be
+        # compiled to Python.)
+        # i = 1; i + (i = 5)
+        program = Program(Assign(Variable("i"), IntLiteral(1)),
+                          Add(Variable("i"), Assign(Variable("i"), IntLiteral(5))))
+        check_run_result((6, Integer(), None), run_stimpl(program))
+
+        # i = 1; s = 0; n = 0; while (n < 100) { s = s + (i + (i = 5)); n = n + 1 }
+        program = Program(Assign(Variable("i"), IntLiteral(1)),
+                          Assign(Variable("s"), IntLiteral(0)),
+                          Assign(Variable("n"), IntLiteral(0)),
+                          While(Lt(Variable("n"), IntLiteral(100)), Sequence(
+                              Assign(Variable("s"), Add(Variable("s"), Add(
+                                  Variable("i"), Assign(Variable("i"), IntLiteral(5))))),
+                              Assign(Variable("n"), Add(Variable("n"), IntLiteral(1))))),
+                          Variable("s"))
+        check_run_result((996, Integer(), None), run_stimpl(program))
+
+        program = Program(Assign(Variable("i"), IntLiteral(3)),
+                          While(Gt(Variable("i"), IntLiteral(-100)),
+                                Sequence(Divide(IntLiteral(1), Variable("i")),
+                                         Assign(Variable("i"), Subtract(Variable("i"), IntLiteral(1))))))
+        check_program_raises(InterpMathError(), program)
+
+        # Subtrees built only from literals are computed once, before the
+        # program runs, but a division by zero among them still raises.
+        program = And(Lt(Add(IntLiteral(1), IntLiteral(2)), IntLiteral(4)),
+                      Not(Eq(StringLiteral("a"), StringLiteral("b"))))
+        check_run_result((True, Boolean(), None), run_stimpl(program))
+
+        program = Program(Assign(Variable("i"), IntLiteral(0)),
+                          Divide(IntLiteral(1), Subtract(IntLiteral(1), IntLiteral(1))))
+        check_program_raises(InterpMathError(), program)
+
+        # The untyped base Literal is not a constant; it stays unhandled.
+        program = Add(Literal(5), IntLiteral(1))
+        check_program_raises(InterpSyntaxError(), program)
+
+        # Subclasses of the expression classes behave like their bases.
+        class MyAdd(Add):
+            pass
+
+        check_run_result((3, Integer(), None), run_stimpl(
+            MyAdd(IntLiteral(1), IntLiteral(2))))
+
+        class MyLt(Lt):
+            pass
+
+        program = Program(Assign(Variable("i"), IntLiteral(0)),
+                          While(MyLt(Variable("i"), IntLiteral(100)),
+                                Assign(Variable("i"), MyAdd(Variable("i"), IntLiteral(1)))),
+                          Variable("i"))
+        check_run_result((100, Integer(), None), run_stimpl(program))
+
+        # Loops nested in loop conditions take time linear in the nesting.
+        program = BooleanLiteral(False)
+        for _ in range(40):
+            program = While(program, Ren())
+        check_run_result((False, Boolean(), None), run_stimpl(program))
+
+        # Deeply nested expressions must not exhaust the Python call stack.
+        program = IntLiteral(0)
+        for _ in range(10000):
+            program = Add(program, IntLiteral(1))
+        check_run_result((10000, Integer(), None), run_stimpl(program))
+
     except Exception as e:
         raise e
 
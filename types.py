@@ -1,83 +1,79 @@
+from typing import ClassVar
+
 """
 Types
 """
 
 
 class Type(object):
+    # Distinct for every kind of type, so comparing two types is a single
+    # integer comparison.
+    TAG: ClassVar[int] = 0
+
     def __init__(self):
         pass
 
+    def __eq__(self, other):
+        return self is other or self.TAG == getattr(other, 'TAG', None)
+
 
 class Unit(Type):
+    TAG = 1
+
     def __init__(self):
         pass
 
     def __repr__(self):
         return "Unit"
 
-    def __eq__(self, other):
-        match other:
-            case Unit():
-                return True
-            case _:
-                return False
-
 
 class Integer(Type):
+    TAG = 2
+
     def __init__(self):
         pass
 
     def __repr__(self):
         return "Integer"
 
-    def __eq__(self, other):
-        match other:
-            case Integer():
-                return True
-            case _:
-                return False
-
 
 class FloatingPoint(Type):
+    TAG = 3
+
     def __init__(self):
         pass
 
     def __repr__(self):
         return "FloatingPoint"
 
-    def __eq__(self, other):
-        match other:
-            case FloatingPoint():
-                return True
-            case _:
-                return False
-
 
 class String(Type):
+    TAG = 4
+
     def __init__(self):
         pass
 
     def __repr__(self):
         return "String"
 
-    def __eq__(self, other):
-        match other:
-            case String():
-                return True
-            case _:
-                return False
-
 
 class Boolean(Type):
+    TAG = 5
+
     def __init__(self):
         pass
 
     def __repr__(self):
         return "Boolean"
 
-    def __eq__(self, other):
-        match other:
-            case Boolean():
-                return True
-            case _:
-                return False
+
+"""
+Shared instances. Types carry no state, so the interpreter reuses these
+instead of allocating a new one for every value it produces.
+"""
+
+UNIT = Unit()
+INTEGER = Integer()
+FLOATING_POINT = FloatingPoint()
+STRING = String()
+BOOLEAN = Boolean()